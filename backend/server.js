@@ -1,86 +1,277 @@
+'use strict';
+
 require('dotenv').config();
 const express = require('express');
 const cors = require('cors');
 const fs = require('fs-extra');
 const path = require('path');
+const crypto = require('crypto');
+const KeepAliveAgent = require('agentkeepalive');
 const matter = require('gray-matter');
-const { openai } = require('openai'); // Will use the SDK constructor inside routes
 const OpenAI = require('openai');
 
 const app = express();
 const PORT = process.env.PORT || 8000;
 const DATA_DIR = process.env.DATA_DIR || path.join(__dirname, '../data');
 
-app.use(cors());
-app.use(express.json());
+// Don't SHA-1 every JSON body for a weak ETag (costly on big project lists); routes that
+// benefit from revalidation set their own cheap ETags, and static files keep serve-static's own ETags
+app.set('etag', false);
+
+// Only API routes need CORS and body parsing; static files and the SPA fallback skip both
+app.use('/api', cors({ exposedHeaders: ['X-Next-Cursor'] }), express.json());
 
 // Ensure data directory exists
 fs.ensureDirSync(DATA_DIR);
 const SETTINGS_FILE = path.join(DATA_DIR, 'settings.json');
 
+// Helper: Freeze a cached value so accidental in-place edits throw instead of corrupting the cache
+function deepFreeze(value) {
+    if (value && typeof value === 'object' && !Object.isFrozen(value)) {
+        Object.freeze(value);
+        for (const child of Object.values(value)) deepFreeze(child);
+    }
+    return value;
+}
+
+// Helper: Write through a temp file + rename, so concurrent readers see either the old or the new file, never a torn one
+let tmpCounter = 0;
+async function writeFileAtomic(filePath, data) {
+    const tmpPath = `${filePath}.${process.pid}.${tmpCounter++}.tmp`;
+    try {
+        await fs.writeFile(tmpPath, data);
+        await fs.rename(tmpPath, filePath);
+    } catch (e) {
+        await fs.remove(tmpPath);
+        throw e;
+    }
+}
+
+// Helper: Atomic counterpart of fs.writeJson (same output format)
+async function writeJsonAtomic(filePath, data, options = {}) {
+    await writeFileAtomic(filePath, JSON.stringify(data, null, options.spaces) + '\n');
+}
+
+const DEFAULT_SETTINGS = deepFreeze({
+    id: 1,
+    openai_api_key: "",
+    openai_base_url: "https://api.openai.com/v1",
+    openai_model: "gpt-3.5-turbo",
+    available_models: ["gpt-3.5-turbo", "gpt-4", "dall-e-3"],
+    provider: "openai",
+    optimize_prompt_template: ""
+});
+
+const DEFAULT_OPTIMIZE_PROMPT = `你是一个专业的提示词工程师 (Prompt Engineer)。
+你的任务是优化用户提供的 Prompt，使其更加清晰、结构化，并能引导 AI 生成更高质量的结果。
+请保持原意不变，但进行以下改进：
+1. 明确角色设定 (Role)
+2. 补充背景信息 (Context)
+3. 细化任务描述 (Task)
+4. 规定输出格式 (Format)
+
+请直接输出优化后的 Prompt 内容，不要包含解释性文字。`;
+
+// Bumped on every API write, so cached categories/settings can be validated without reading files
+const BOOT_ID = Date.now().toString(36);
+let categoriesVersion = 0;
+let settingsVersion = 0;
+
+// Helper: Set the ETag and answer 304 if the client already has it (returns true when handled)
+function notModified(req, res, etag) {
+    res.set('ETag', etag);
+    // req.fresh matches weak tags (W/"...", added by compressing proxies) and If-None-Match lists
+    if (req.fresh) {
+        res.status(304).end();
+        return true;
+    }
+    return false;
+}
+
+// Settings change only through PUT /api/settings, so keep the last read/saved copy in memory
+let settingsCache = null;
+
 // Helper: Read Settings
 async function getSettings() {
+    if (settingsCache) return settingsCache;
     try {
         if (await fs.pathExists(SETTINGS_FILE)) {
-            return await fs.readJson(SETTINGS_FILE);
+            settingsCache = deepFreeze(await fs.readJson(SETTINGS_FILE));
+            return settingsCache;
         }
     } catch (e) {
         console.error("Error reading settings", e);
     }
-    // Default settings
-    return {
-        id: 1,
-        openai_api_key: "",
-        openai_base_url: "https://api.openai.com/v1",
-        openai_model: "gpt-3.5-turbo",
-        available_models: ["gpt-3.5-turbo", "gpt-4", "dall-e-3"],
-        provider: "openai",
-        optimize_prompt_template: ""
-    };
+    // Default settings (not cached, so a settings file created later is still picked up)
+    return DEFAULT_SETTINGS;
 }
 
 // Helper: Save Settings
 async function saveSettings(settings) {
-    await fs.writeJson(SETTINGS_FILE, settings, { spaces: 2 });
+    await writeJsonAtomic(SETTINGS_FILE, settings, { spaces: 2 });
+    settingsCache = deepFreeze(settings);
+    settingsVersion++;
+    // Credentials may have changed; drop clients built from the old ones
+    resetOpenAIClients();
     return settings;
 }
 
-// --- Category Routes ---
+// OpenAI clients keyed by API key + base URL, so keep-alive connections survive between requests
+const openaiClients = new Map();
+
+// Helper: Get a shared OpenAI client for the configured provider
+function getOpenAIClient(settings) {
+    const key = `${settings.openai_api_key}|${settings.openai_base_url}`;
+    let entry = openaiClients.get(key);
+    if (!entry) {
+        // Same keep-alive agent the SDK uses by default (idle sockets expire before the upstream drops
+        // them), but bounded: concurrent upstream connections and idle sockets are capped
+        const Agent = (settings.openai_base_url || '').startsWith('http://')
+            ? KeepAliveAgent
+            : KeepAliveAgent.HttpsAgent;
+        const agent = new Agent({
+            keepAlive: true,
+            maxSockets: 40,
+            maxFreeSockets: 20,
+            freeSocketTimeout: 4000,
+            timeout: 5 * 60 * 1000
+        });
+        const client = new OpenAI({
+            apiKey: settings.openai_api_key,
+            baseURL: settings.openai_base_url,
+            httpAgent: agent
+        });
+        entry = { client, agent };
+        openaiClients.set(key, entry);
+    }
+    return entry.client;
+}
+
+// Helper: Destroy an agent once its in-flight calls have released their sockets
+function retireAgent(agent) {
+    const busy = () => Object.keys(agent.sockets).length > 0 || Object.keys(agent.requests).length > 0;
+    const destroyWhenIdle = () => setImmediate(() => {
+        if (!busy()) agent.destroy();
+    });
+    // In-flight sockets either go back to the pool ('free') or close; re-check after each
+    agent.on('free', destroyWhenIdle);
+    for (const sockets of Object.values(agent.sockets)) {
+        sockets.forEach(socket => socket.once('close', destroyWhenIdle));
+    }
+    destroyWhenIdle();
+}
+
+// Helper: Forget cached clients; their agents are destroyed once in-flight calls finish
+function resetOpenAIClients() {
+    for (const { agent } of openaiClients.values()) retireAgent(agent);
+    openaiClients.clear();
+}
+
+// Helper: Relay a streamed chat completion to the browser as Server-Sent Events
+async function sendCompletionStream(res, stream) {
+    res.set({
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        // Tell nginx (frontend/nginx.conf proxies /api) not to buffer the stream
+        'X-Accel-Buffering': 'no'
+    });
+    res.flushHeaders();
 
-// Get Categories (Subdirectories in DATA_DIR)
-app.get('/api/categories', async (req, res) => {
     try {
-        const items = await fs.readdir(DATA_DIR, { withFileTypes: true });
-        const categories = [];
-
-        for (const item of items) {
-            if (item.isDirectory() && !item.name.startsWith('.')) {
-                // Try to read a metadata file for the category if we want to store color/icon
-                // For now, we'll just use the folder name, or maybe a .meta.json inside it
-                // To keep it simple and match existing UI which expects id, name, color, icon, sort_order
-                // We will default these values or look for a special file.
-
-                // Strategy: Look for `_category.json` inside the folder
-                const metaPath = path.join(DATA_DIR, item.name, '_category.json');
-                let meta = {
-                    id: item.name, // Use name as ID for simplicity in FS mode, or hash it
-                    name: item.name,
-                    color: 'blue',
-                    icon: null,
-                    sort_order: 99
-                };
+        for await (const chunk of stream) {
+            const delta = chunk.choices[0]?.delta?.content;
+            if (delta) res.write(`data: ${JSON.stringify({ delta })}\n\n`);
+        }
+        res.write('data: [DONE]\n\n');
+    } catch (e) {
+        // The client hung up (and abortOnClose cancelled the upstream call): nothing to report to
+        if (res.destroyed) return;
+        // Headers are already sent, so report failures in-band
+        console.error("AI Stream Error", e);
+        res.write(`event: error\ndata: ${JSON.stringify({ detail: e.message })}\n\n`);
+    }
+    res.end();
+}
 
-                if (await fs.pathExists(metaPath)) {
-                    const fileMeta = await fs.readJson(metaPath);
-                    meta = { ...meta, ...fileMeta };
-                }
+// Helper: Abort an upstream AI call once the browser disconnects, instead of waiting out the timeout
+function abortOnClose(res) {
+    const controller = new AbortController();
+    res.on('close', () => {
+        if (!res.writableEnded) controller.abort();
+    });
+    return controller.signal;
+}
 
-                categories.push(meta);
-            }
+// --- Category Routes ---
+
+// Category list cache; API writes invalidate it via categoriesVersion, the TTL bounds staleness
+// for folders or _category.json files edited directly on disk
+const CATEGORIES_TTL_MS = 30 * 1000;
+let categoriesCache = null;
+// ETag per rebuilt list, hashed from its contents so a TTL rebuild of an unchanged list keeps its tag
+const categoriesEtags = new WeakMap();
+
+// Helper: Read all categories sorted by sort_order (cached while fresh)
+async function getCategories() {
+    // Folders added/renamed/removed on disk touch DATA_DIR's mtime
+    const dirMtime = (await fs.stat(DATA_DIR)).mtimeMs;
+    if (categoriesCache &&
+        categoriesCache.version === categoriesVersion &&
+        categoriesCache.dirMtime === dirMtime &&
+        Date.now() < categoriesCache.expires) {
+        return categoriesCache.categories;
+    }
+
+    const version = categoriesVersion;
+    const items = await fs.readdir(DATA_DIR, { withFileTypes: true });
+    const dirs = items.filter(item => item.isDirectory() && !item.name.startsWith('.'));
+
+    // Metadata files are independent, so read them concurrently
+    const categories = await Promise.all(dirs.map(async (item) => {
+        // Try to read a metadata file for the category if we want to store color/icon
+        // For now, we'll just use the folder name, or maybe a .meta.json inside it
+        // To keep it simple and match existing UI which expects id, name, color, icon, sort_order
+        // We will default these values or look for a special file.
+
+        // Strategy: Look for `_category.json` inside the folder
+        const metaPath = path.join(DATA_DIR, item.name, '_category.json');
+        let meta = {
+            id: item.name, // Use name as ID for simplicity in FS mode, or hash it
+            name: item.name,
+            color: 'blue',
+            icon: null,
+            sort_order: 99
+        };
+
+        if (await fs.pathExists(metaPath)) {
+            const fileMeta = await fs.readJson(metaPath);
+            meta = { ...meta, ...fileMeta };
         }
 
-        // Sort by sort_order
-        categories.sort((a, b) => a.sort_order - b.sort_order);
+        return meta;
+    }));
+
+    // Sort by sort_order
+    categories.sort((a, b) => a.sort_order - b.sort_order);
+
+    categoriesEtags.set(categories, `"${crypto.createHash('sha1').update(JSON.stringify(categories)).digest('hex')}"`);
+    categoriesCache = {
+        version,
+        dirMtime,
+        expires: Date.now() + CATEGORIES_TTL_MS,
+        categories: deepFreeze(categories)
+    };
+    return categories;
+}
+
+// Get Categories (Subdirectories in DATA_DIR)
+app.get('/api/categories', async (req, res) => {
+    try {
+        // A cache hit costs one stat, and the list's content hash tells us whether the client is current
+        const categories = await getCategories();
+        if (notModified(req, res, categoriesEtags.get(categories))) return;
+
         res.json(categories);
     } catch (e) {
         res.status(500).json({ error: e.message });
@@ -92,24 +283,26 @@ app.put('/api/categories/reorder', async (req, res) => {
     try {
         const items = req.body; // Expects [{id, sort_order}, ...]
 
-        for (const item of items) {
+        // Each category has its own metadata file, so update them all in one concurrent batch
+        await Promise.all(items.map(async (item) => {
             const dirPath = path.join(DATA_DIR, item.id);
-            if (await fs.pathExists(dirPath)) {
-                const metaPath = path.join(dirPath, '_category.json');
-                let meta = {};
-                if (await fs.pathExists(metaPath)) {
-                    meta = await fs.readJson(metaPath);
-                } else {
-                    meta = {
-                        id: item.id,
-                        name: item.id,
-                        color: 'blue'
-                    };
-                }
-                meta.sort_order = item.sort_order;
-                await fs.writeJson(metaPath, meta);
+            if (!await fs.pathExists(dirPath)) return;
+
+            const metaPath = path.join(dirPath, '_category.json');
+            let meta = {};
+            if (await fs.pathExists(metaPath)) {
+                meta = await fs.readJson(metaPath);
+            } else {
+                meta = {
+                    id: item.id,
+                    name: item.id,
+                    color: 'blue'
+                };
             }
-        }
+            meta.sort_order = item.sort_order;
+            await writeJsonAtomic(metaPath, meta);
+        }));
+        categoriesVersion++;
         res.json({ ok: true });
     } catch (e) {
         res.status(500).json({ error: e.message });
@@ -136,7 +329,8 @@ app.post('/api/categories', async (req, res) => {
             icon: icon || null,
             sort_order: Date.now() // Simple sort order
         };
-        await fs.writeJson(path.join(dirPath, '_category.json'), meta);
+        await writeJsonAtomic(path.join(dirPath, '_category.json'), meta);
+        categoriesVersion++;
 
         res.json(meta);
     } catch (e) {
@@ -164,6 +358,7 @@ app.put('/api/categories/:id', async (req, res) => {
                 return res.status(400).json({ error: "Target category name already exists" });
             }
             await fs.rename(oldPath, newPath);
+            forgetCategory(oldName);
         }
 
         // Update metadata
@@ -178,7 +373,8 @@ app.put('/api/categories/:id', async (req, res) => {
         meta.icon = icon || meta.icon;
         meta.id = name; // Update ID if name changed
 
-        await fs.writeJson(metaPath, meta);
+        await writeJsonAtomic(metaPath, meta);
+        categoriesVersion++;
 
         res.json(meta);
     } catch (e) {
@@ -190,12 +386,11 @@ app.delete('/api/categories/:id', async (req, res) => {
     const name = req.params.id;
     const dirPath = path.join(DATA_DIR, name);
     try {
-        if (await fs.pathExists(dirPath)) {
-            // Check if directory is empty or if we should delete explicitly
-            // For safety, let's move files to a 'Trash' or just delete if user requested
-            // The requirement says "directly through folders", so standard delete is expected.
-            await fs.remove(dirPath);
-        }
+        // The requirement says "directly through folders", so standard delete is expected.
+        // One recursive remove takes the projects with it (and is a no-op if the folder is gone).
+        await fs.remove(dirPath);
+        forgetCategory(name);
+        categoriesVersion++;
         res.json({ ok: true });
     } catch (e) {
         res.status(500).json({ error: e.message });
@@ -216,6 +411,7 @@ async function migrateToSplitFormat(catName, fileName) {
 
     // Only migrate if we have frontmatter data to save
     if (Object.keys(parsed.data).length > 0) {
+        const now = new Date().toISOString();
         const meta = {
             id: parsed.data.id || baseName,
             name: parsed.data.name || baseName, // Ensure we keep the name
@@ -223,19 +419,118 @@ async function migrateToSplitFormat(catName, fileName) {
             tags: parsed.data.tags || [],
             category_id: catName,
             is_favorite: parsed.data.is_favorite || false,
-            created_at: parsed.data.created_at || new Date().toISOString(),
-            updated_at: parsed.data.updated_at || new Date().toISOString(),
+            created_at: parsed.data.created_at || now,
+            updated_at: parsed.data.updated_at || now,
             type: parsed.data.type || 'text',
             versions: parsed.data.versions || []
         };
 
-        await fs.writeJson(jsonPath, meta, { spaces: 2 });
-        await fs.writeFile(filePath, parsed.content); // Overwrite MD with pure content
+        await writeJsonAtomic(jsonPath, meta, { spaces: 2 });
+        await writeFileAtomic(filePath, parsed.content); // Overwrite MD with pure content
         return meta;
     }
     return null;
 }
 
+// Cache of project id -> category folder, so by-id routes don't rescan every category
+const projectLocations = new Map();
+
+async function projectExists(catName, baseName) {
+    return await fs.pathExists(path.join(DATA_DIR, catName, `${baseName}.md`)) ||
+        await fs.pathExists(path.join(DATA_DIR, catName, `${baseName}.json`));
+}
+
+// Helper: Find the category folder of a project (null if missing)
+async function findProjectCategory(baseName) {
+    const cached = projectLocations.get(baseName);
+    if (cached && await projectExists(cached, baseName)) {
+        return cached;
+    }
+    // Stale or unknown (e.g. folder renamed on disk): fall back to a full scan
+    projectLocations.delete(baseName);
+
+    const cats = await fs.readdir(DATA_DIR);
+    for (const cat of cats) {
+        if (cat.startsWith('.')) continue;
+        if (await projectExists(cat, baseName)) {
+            projectLocations.set(baseName, cat);
+            return cat;
+        }
+    }
+    return null;
+}
+
+// Parsed projects keyed by JSON path; an entry is reused while both files keep the same inode/mtime/size
+const projectCache = new Map();
+
+// Lowercased name/description/tags/content per project object, so searches don't re-lowercase every prompt
+const searchTexts = new WeakMap();
+
+// Helper: Cheap change signature for a file (null if missing). Writes go through temp file + rename,
+// so the inode changes on every write even when a coarse mtime and the size don't
+async function fileSignature(filePath) {
+    try {
+        const stat = await fs.stat(filePath);
+        return `${stat.ino}:${stat.mtimeMs}:${stat.size}`;
+    } catch {
+        return null;
+    }
+}
+
+// Helper: Drop cached entries for a whole category folder (renamed or deleted)
+function forgetCategory(catName) {
+    const prefix = path.join(DATA_DIR, catName) + path.sep;
+    for (const key of projectCache.keys()) {
+        if (key.startsWith(prefix)) projectCache.delete(key);
+    }
+    for (const [id, cat] of projectLocations) {
+        if (cat === catName) projectLocations.delete(id);
+    }
+}
+
+function getSearchText(project) {
+    let text = searchTexts.get(project);
+    if (text === undefined) {
+        const tags = Array.isArray(project.tags) ? project.tags : [];
+        text = [project.name, project.description, ...tags, project.current_content]
+            .filter(Boolean)
+            .join('\u0000')
+            .toLowerCase();
+        searchTexts.set(project, text);
+    }
+    return text;
+}
+
+// Listing rows without the heavy fields (prompt body, version history), built once per project object
+const listItems = new WeakMap();
+
+function toListItem(project) {
+    let item = listItems.get(project);
+    if (item === undefined) {
+        const { current_content, versions, ...rest } = project;
+        item = Object.freeze(rest);
+        listItems.set(project, item);
+    }
+    return item;
+}
+
+// Helper: Read a project's Markdown body ('' if it has none)
+async function readProjectContent(catName, baseName) {
+    const mdPath = path.join(DATA_DIR, catName, `${baseName}.md`);
+    if (await fs.pathExists(mdPath)) {
+        return await fs.readFile(mdPath, 'utf8');
+    }
+    return '';
+}
+
+// Helper: Build the response for a project we just wrote, instead of reading both files back.
+// The cached copy is only dropped: another write may already have replaced the files, so the
+// next read refills the cache from disk rather than pairing this object with its signature
+function projectAfterWrite(catName, baseName, meta, content) {
+    projectCache.delete(path.join(DATA_DIR, catName, `${baseName}.json`));
+    return { ...meta, current_content: content };
+}
+
 // Helper: Read a project file
 async function readProjectFile(catName, fileName) {
     const baseName = fileName.replace('.md', '').replace('.json', '');
@@ -245,17 +540,26 @@ async function readProjectFile(catName, fileName) {
     const mdPath = path.join(DATA_DIR, catName, mdName);
     const jsonPath = path.join(DATA_DIR, catName, jsonName);
 
-    // 1. Try to read JSON metadata
-    if (await fs.pathExists(jsonPath)) {
+    // 1. Try to read JSON metadata (served from cache when unchanged on disk)
+    const jsonSig = await fileSignature(jsonPath);
+    if (jsonSig !== null) {
+        const mdSig = await fileSignature(mdPath);
+        const cached = projectCache.get(jsonPath);
+        if (cached && cached.jsonSig === jsonSig && cached.mdSig === mdSig) {
+            return cached.project;
+        }
+
         const meta = await fs.readJson(jsonPath);
         let content = '';
-        if (await fs.pathExists(mdPath)) {
+        if (mdSig !== null) {
             content = await fs.readFile(mdPath, 'utf8');
         }
-        return {
+        const project = {
             ...meta,
             current_content: content
         };
+        projectCache.set(jsonPath, { jsonSig, mdSig, project: deepFreeze(project) });
+        return project;
     }
 
     // 2. Fallback: Old format (MD with frontmatter) -> Migrate it now?
@@ -271,6 +575,7 @@ async function readProjectFile(catName, fileName) {
         // Reuse old logic if migration didn't happen (shouldn't happen with matter)
         const content = await fs.readFile(mdPath, 'utf8');
         const parsed = matter(content);
+        const now = new Date().toISOString();
         return {
             id: baseName,
             name: baseName,
@@ -278,8 +583,8 @@ async function readProjectFile(catName, fileName) {
             tags: [],
             category_id: catName,
             is_favorite: false,
-            created_at: new Date().toISOString(),
-            updated_at: new Date().toISOString(),
+            created_at: now,
+            updated_at: now,
             type: 'text',
             versions: [],
             current_content: parsed.content
@@ -289,49 +594,105 @@ async function readProjectFile(catName, fileName) {
     throw new Error("Project not found");
 }
 
+// Helper: Names of all category folders
+async function listCategoryDirs() {
+    // Dirents already carry their type, so this needs no per-category stat
+    return (await fs.readdir(DATA_DIR, { withFileTypes: true }))
+        .filter(item => item.isDirectory() && !item.name.startsWith('.'))
+        .map(item => item.name);
+}
+
+// Helper: Read every project in a category folder
+async function readCategoryProjects(cat) {
+    const files = (await fs.readdir(path.join(DATA_DIR, cat))).filter(file => file.endsWith('.md'));
+    return Promise.all(files.map(async (file) => {
+        const fw = await readProjectFile(cat, file);
+        projectLocations.set(file.replace('.md', ''), cat);
+        return fw;
+    }));
+}
+
+// Helper: Load every project once so the first listing/search after boot is served from cache
+async function warmProjectCache() {
+    const cats = await listCategoryDirs();
+    await Promise.all(cats.map(readCategoryProjects));
+}
+
+// Helper: Order project ids as strings (the listing's tie-break)
+function compareIds(a, b) {
+    const x = String(a);
+    const y = String(b);
+    return x < y ? -1 : x > y ? 1 : 0;
+}
+
+// Helper: Listing cursor "<updated_at in ms>:<id>"; rows whose updated_at doesn't parse use 0,
+// so every row yields a valid cursor
+function encodeCursor(key, id) {
+    return `${key}:${id}`;
+}
+
+function parseCursor(cursor) {
+    const match = /^(-?\d+):([\s\S]+)$/.exec(cursor);
+    return match ? { key: Number(match[1]), id: match[2] } : null;
+}
+
 // Get Projects
 app.get('/api/projects', async (req, res) => {
     try {
-        const { category_id, search, is_favorite } = req.query;
-        let projects = [];
+        const { category_id, search, is_favorite, cursor, limit } = req.query;
 
-        // If category_id (folder) is specified, search only there
-        const catsToSearch = category_id ? [category_id] : (await fs.readdir(DATA_DIR)).filter(n => !n.startsWith('.'));
+        // Optional keyset pagination: ?limit=N, then ?cursor=<X-Next-Cursor of the previous page>
+        let after = null;
+        if (cursor !== undefined) {
+            after = typeof cursor === 'string' ? parseCursor(cursor) : null;
+            if (!after) return res.status(400).json({ error: "Invalid cursor" });
+        }
 
-        for (const cat of catsToSearch) {
-            const catPath = path.join(DATA_DIR, cat);
-            // Verify catPath is actually a directory
+        // If category_id (folder) is specified, search only there
+        let catsToSearch = [];
+        if (category_id) {
+            // Verify it is actually a directory
             try {
-                const stat = await fs.stat(catPath);
-                if (!stat.isDirectory()) continue;
-            } catch { continue; }
-
-            const files = await fs.readdir(catPath);
-            for (const file of files) {
-                if (file.endsWith('.md')) {
-                    const fw = await readProjectFile(cat, file);
-                    projects.push(fw);
-                }
-            }
+                const stat = await fs.stat(path.join(DATA_DIR, category_id));
+                if (stat.isDirectory()) catsToSearch = [category_id];
+            } catch { }
+        } else {
+            catsToSearch = await listCategoryDirs();
         }
 
+        // Read all categories and their files concurrently instead of one await at a time
+        const perCategory = await Promise.all(catsToSearch.map(readCategoryProjects));
+        let projects = perCategory.flat();
+
         // Filters
         if (is_favorite === 'true') {
             projects = projects.filter(p => p.is_favorite);
         }
         if (search) {
             const lowerSearch = search.toLowerCase();
-            projects = projects.filter(p =>
-                (p.name && p.name.toLowerCase().includes(lowerSearch)) ||
-                (p.description && p.description.toLowerCase().includes(lowerSearch)) ||
-                (p.current_content && p.current_content.toLowerCase().includes(lowerSearch))
-            );
+            projects = projects.filter(p => getSearchText(p).includes(lowerSearch));
         }
 
-        // Sort by updated_at desc
-        projects.sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
+        // Sort by updated_at desc, parsing each timestamp once rather than on every comparison;
+        // id breaks ties so the order (and therefore the cursor) is total
+        const sortKeys = new Map(projects.map(p => [p, Date.parse(p.updated_at) || 0]));
+        projects.sort((a, b) => (sortKeys.get(b) - sortKeys.get(a)) || compareIds(a.id, b.id));
+
+        if (after) {
+            projects = projects.filter(p => {
+                const key = sortKeys.get(p);
+                return key < after.key || (key === after.key && compareIds(p.id, after.id) > 0);
+            });
+        }
+        const pageSize = parseInt(limit);
+        if (pageSize > 0 && projects.length > pageSize) {
+            projects = projects.slice(0, pageSize);
+            const last = projects[projects.length - 1];
+            res.set('X-Next-Cursor', encodeCursor(sortKeys.get(last), last.id));
+        }
 
-        res.json(projects);
+        // Cards only need metadata; full content and versions come from the per-project routes
+        res.json(projects.map(toListItem));
 
     } catch (e) {
         console.error(e);
@@ -369,11 +730,12 @@ app.post('/api/projects', async (req, res) => {
         };
 
         // Write JSON
-        await fs.writeJson(path.join(DATA_DIR, category_id, jsonName), meta, { spaces: 2 });
+        await writeJsonAtomic(path.join(DATA_DIR, category_id, jsonName), meta, { spaces: 2 });
         // Write Empty MD
-        await fs.writeFile(path.join(DATA_DIR, category_id, mdName), '');
+        await writeFileAtomic(path.join(DATA_DIR, category_id, mdName), '');
+        projectLocations.set(baseName, category_id);
 
-        res.json({ ...meta, current_content: '' });
+        res.json(projectAfterWrite(category_id, baseName, meta, ''));
     } catch (e) {
         res.status(500).json({ error: e.message });
     }
@@ -382,19 +744,9 @@ app.post('/api/projects', async (req, res) => {
 app.get('/api/projects/:id', async (req, res) => {
     const id = req.params.id;
     try {
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            const catPath = path.join(DATA_DIR, cat);
-            try {
-                if (!(await fs.stat(catPath)).isDirectory()) continue;
-            } catch { continue; }
-
-            // Check if file exists (MD or JSON)
-            if (await fs.pathExists(path.join(catPath, `${id}.md`)) ||
-                await fs.pathExists(path.join(catPath, `${id}.json`))) {
-                return res.json(await readProjectFile(cat, `${id}.md`));
-            }
+        const cat = await findProjectCategory(id);
+        if (cat) {
+            return res.json(await readProjectFile(cat, `${id}.md`));
         }
         res.status(404).json({ error: "Project not found" });
     } catch (e) {
@@ -408,24 +760,14 @@ app.put('/api/projects/:id', async (req, res) => {
 
     try {
         // Find the file
-        let currentCat = null;
-        let baseName = id;
-
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            if (await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.md`)) ||
-                await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.json`))) {
-                currentCat = cat;
-                break;
-            }
-        }
+        const baseName = id;
+        const currentCat = await findProjectCategory(baseName);
 
         if (!currentCat) return res.status(404).json({ error: "Project not found" });
 
-        // Force migration if needed (ensures we have JSON to edit)
-        if (await fs.pathExists(path.join(DATA_DIR, currentCat, `${baseName}.md`)) &&
-            !await fs.pathExists(path.join(DATA_DIR, currentCat, `${baseName}.json`))) {
+        // Force migration if needed (ensures we have JSON to edit); JSON is checked first as it usually exists
+        if (!await fs.pathExists(path.join(DATA_DIR, currentCat, `${baseName}.json`)) &&
+            await fs.pathExists(path.join(DATA_DIR, currentCat, `${baseName}.md`))) {
             await migrateToSplitFormat(currentCat, `${baseName}.md`);
         }
 
@@ -446,9 +788,13 @@ app.put('/api/projects/:id', async (req, res) => {
         // Note: The frontend might pass `current_content` or just metadata.
         // We write content to MD.
         if (current_content !== undefined) {
-            await fs.writeFile(mdPath, current_content);
+            await writeFileAtomic(mdPath, current_content);
         }
 
+        const content = current_content !== undefined
+            ? current_content
+            : await readProjectContent(currentCat, baseName);
+
         // Handle Category Move
         if (category_id && category_id !== currentCat) {
             const newDir = path.join(DATA_DIR, category_id);
@@ -458,18 +804,20 @@ app.put('/api/projects/:id', async (req, res) => {
 
             // Move JSON
             await fs.move(jsonPath, path.join(newDir, `${baseName}.json`));
+            projectCache.delete(jsonPath);
             // Move MD
             if (await fs.pathExists(mdPath)) {
                 await fs.move(mdPath, path.join(newDir, `${baseName}.md`));
             }
 
             // Update JSON with new category
-            await fs.writeJson(path.join(newDir, `${baseName}.json`), meta, { spaces: 2 });
+            await writeJsonAtomic(path.join(newDir, `${baseName}.json`), meta, { spaces: 2 });
+            projectLocations.set(baseName, category_id);
 
-            return res.json(await readProjectFile(category_id, baseName));
+            return res.json(projectAfterWrite(category_id, baseName, meta, content));
         } else {
-            await fs.writeJson(jsonPath, meta, { spaces: 2 });
-            return res.json(await readProjectFile(currentCat, baseName));
+            await writeJsonAtomic(jsonPath, meta, { spaces: 2 });
+            return res.json(projectAfterWrite(currentCat, baseName, meta, content));
         }
 
     } catch (e) {
@@ -481,25 +829,20 @@ app.put('/api/projects/:id', async (req, res) => {
 app.delete('/api/projects/:id', async (req, res) => {
     const id = req.params.id;
     try {
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            const mdPath = path.join(DATA_DIR, cat, `${id}.md`);
-            const jsonPath = path.join(DATA_DIR, cat, `${id}.json`);
+        const cat = await findProjectCategory(id);
+        if (!cat) return res.status(404).json({ error: "Project not found" });
 
-            let found = false;
-            if (await fs.pathExists(mdPath)) {
-                await fs.unlink(mdPath);
-                found = true;
-            }
-            if (await fs.pathExists(jsonPath)) {
-                await fs.unlink(jsonPath);
-                found = true;
-            }
+        const mdPath = path.join(DATA_DIR, cat, `${id}.md`);
+        const jsonPath = path.join(DATA_DIR, cat, `${id}.json`);
 
-            if (found) return res.json({ ok: true });
-        }
-        res.status(404).json({ error: "Project not found" });
+        // Unlink directly rather than stat-then-unlink; a missing half is fine
+        await Promise.all([mdPath, jsonPath].map(p => fs.unlink(p).catch(e => {
+            if (e.code !== 'ENOENT') throw e;
+        })));
+        projectLocations.delete(id);
+        projectCache.delete(jsonPath);
+
+        res.json({ ok: true });
     } catch (e) {
         res.status(500).json({ error: e.message });
     }
@@ -508,18 +851,8 @@ app.delete('/api/projects/:id', async (req, res) => {
 app.post('/api/projects/:id/favorite', async (req, res) => {
     const id = req.params.id;
     try {
-        let currentCat = null;
-        let baseName = id;
-
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            if (await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.md`)) ||
-                await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.json`))) {
-                currentCat = cat;
-                break;
-            }
-        }
+        const baseName = id;
+        const currentCat = await findProjectCategory(baseName);
 
         if (!currentCat) return res.status(404).json({ error: "Project not found" });
 
@@ -533,9 +866,10 @@ app.post('/api/projects/:id/favorite', async (req, res) => {
 
         meta.is_favorite = !meta.is_favorite;
 
-        await fs.writeJson(jsonPath, meta, { spaces: 2 });
+        await writeJsonAtomic(jsonPath, meta, { spaces: 2 });
 
-        res.json(await readProjectFile(currentCat, baseName));
+        const content = await readProjectContent(currentCat, baseName);
+        res.json(projectAfterWrite(currentCat, baseName, meta, content));
 
     } catch (e) {
         res.status(500).json({ error: e.message });
@@ -550,18 +884,8 @@ app.post('/api/projects/:id/versions', async (req, res) => {
     const { content, parameters } = req.body;
 
     try {
-        let currentCat = null;
         const baseName = id;
-
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            if (await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.md`)) ||
-                await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.json`))) {
-                currentCat = cat;
-                break;
-            }
-        }
+        const currentCat = await findProjectCategory(baseName);
 
         if (!currentCat) return res.status(404).json({ error: "Project not found" });
 
@@ -575,25 +899,29 @@ app.post('/api/projects/:id/versions', async (req, res) => {
 
         const meta = await fs.readJson(jsonPath);
 
-        // Add new version
+        // Add new version (stamped with the same time as the project update)
+        const now = new Date().toISOString();
         const versions = meta.versions || [];
+        // Next number follows the highest existing one, so gaps (e.g. hand-edited files) never reuse a number
+        const lastNum = versions.reduce((max, v) => Math.max(max, v.version_num || 0), 0);
         const newVersion = {
             id: Date.now(),
-            version_num: versions.length + 1,
+            version_num: lastNum + 1,
             content: content,
             parameters: parameters || {},
-            created_at: new Date().toISOString()
+            created_at: now
         };
 
         versions.push(newVersion);
         meta.versions = versions;
-        meta.updated_at = new Date().toISOString();
+        meta.updated_at = now;
 
         // Save JSON
-        await fs.writeJson(jsonPath, meta, { spaces: 2 });
+        await writeJsonAtomic(jsonPath, meta, { spaces: 2 });
 
         // Update MD Content
-        await fs.writeFile(mdPath, content);
+        await writeFileAtomic(mdPath, content);
+        projectCache.delete(jsonPath);
 
         res.json(newVersion);
 
@@ -605,18 +933,8 @@ app.post('/api/projects/:id/versions', async (req, res) => {
 app.get('/api/projects/:id/versions', async (req, res) => {
     const id = req.params.id;
     try {
-        let currentCat = null;
         const baseName = id;
-
-        const cats = await fs.readdir(DATA_DIR);
-        for (const cat of cats) {
-            if (cat.startsWith('.')) continue;
-            if (await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.md`)) ||
-                await fs.pathExists(path.join(DATA_DIR, cat, `${baseName}.json`))) {
-                currentCat = cat;
-                break;
-            }
-        }
+        const currentCat = await findProjectCategory(baseName);
 
         if (!currentCat) return res.status(404).json({ error: "Project not found" });
 
@@ -647,6 +965,7 @@ app.get('/api/projects/:id/versions', async (req, res) => {
 // --- Settings and AI ---
 
 app.get('/api/settings', async (req, res) => {
+    if (notModified(req, res, `"s-${BOOT_ID}-${settingsVersion}"`)) return;
     res.json(await getSettings());
 });
 
@@ -660,6 +979,13 @@ app.put('/api/settings', async (req, res) => {
 });
 
 // --- Auth Routes ---
+
+// Helper: Constant-time password check (hashing first makes both sides the same length)
+function passwordMatches(candidate, expected) {
+    const digest = (value) => crypto.createHash('sha256').update(String(value ?? '')).digest();
+    return crypto.timingSafeEqual(digest(candidate), digest(expected));
+}
+
 app.get('/api/auth/status', async (req, res) => {
     const settings = await getSettings();
     // Simple logic: if admin_password is set, auth is enabled.
@@ -681,7 +1007,7 @@ app.post('/api/auth/login', async (req, res) => {
     const { password } = req.body;
     const settings = await getSettings();
 
-    if (settings.admin_password && password === settings.admin_password) {
+    if (settings.admin_password && passwordMatches(password, settings.admin_password)) {
         // TODO: Set cookie or token
         return res.json({ ok: true });
     }
@@ -696,7 +1022,7 @@ app.post('/api/auth/logout', (req, res) => {
 
 app.post('/api/ai/run', async (req, res) => {
     // Similar to Python logic but using Node SDK
-    const { prompt, type, model, parameters } = req.body;
+    const { prompt, type, model, parameters, stream } = req.body;
     const settings = await getSettings();
 
     if (!settings.openai_api_key) {
@@ -704,11 +1030,8 @@ app.post('/api/ai/run', async (req, res) => {
     }
 
     try {
-        const client = new OpenAI({
-            apiKey: settings.openai_api_key,
-            baseURL: settings.openai_base_url,
-            timeout: 60000 // 60s
-        });
+        const client = getOpenAIClient(settings);
+        const signal = abortOnClose(res);
 
         if (type === 'image') {
             const response = await client.images.generate({
@@ -717,16 +1040,18 @@ app.post('/api/ai/run', async (req, res) => {
                 size: "1024x1024",
                 quality: "standard",
                 n: 1,
-            });
+            }, { timeout: 60000, signal }); // 60s
             res.json({ result: response.data[0].url });
         } else {
-            // Text
+            // Text (streamed as SSE when the client asks for `stream: true`)
             const response = await client.chat.completions.create({
                 model: model || settings.openai_model,
                 messages: [{ role: "user", content: prompt }],
                 temperature: parameters?.temperature ? parseFloat(parameters.temperature) : 0.7,
-                max_tokens: parameters?.max_tokens ? parseInt(parameters.max_tokens) : 2000
-            });
+                max_tokens: parameters?.max_tokens ? parseInt(parameters.max_tokens) : 2000,
+                stream: !!stream
+            }, { timeout: 60000, signal }); // 60s
+            if (stream) return sendCompletionStream(res, response);
             res.json({ result: response.choices[0].message.content });
         }
 
@@ -736,25 +1061,13 @@ app.post('/api/ai/run', async (req, res) => {
     }
 });
 
-app.post('/api/ai/analyze', async (req, res) => {
-    const { prompt } = req.body;
-    const settings = await getSettings();
-
-    if (!settings.openai_api_key) {
-        return res.status(400).json({ detail: "请先在设置中配置 API Key" });
-    }
-
-    try {
-        const client = new OpenAI({
-            apiKey: settings.openai_api_key,
-            baseURL: settings.openai_base_url,
-            timeout: 30000
-        });
-
-        const categories = (await fs.readdir(DATA_DIR)).filter(n => !n.startsWith('.'));
-        const catStr = categories.join(", ");
+// Analyze system prompt for the current category list; rebuilt only when getCategories() returns a new list
+let analyzePromptCache = { categories: null, text: '' };
 
-        const systemPrompt = `
+function getAnalyzeSystemPrompt(categories) {
+    if (analyzePromptCache.categories !== categories) {
+        const catStr = categories.map(c => c.name).join(", ");
+        const text = `
         Analyze the user's prompt and extract structured metadata in valid JSON format.
         Fields:
         - name: A short, catchy title (max 20 chars).
@@ -765,6 +1078,24 @@ app.post('/api/ai/analyze', async (req, res) => {
         
         Output strictly JSON. No markdown code blocks.
         `;
+        analyzePromptCache = { categories, text };
+    }
+    return analyzePromptCache.text;
+}
+
+app.post('/api/ai/analyze', async (req, res) => {
+    const { prompt } = req.body;
+    const settings = await getSettings();
+
+    if (!settings.openai_api_key) {
+        return res.status(400).json({ detail: "请先在设置中配置 API Key" });
+    }
+
+    try {
+        const client = getOpenAIClient(settings);
+        const signal = abortOnClose(res);
+
+        const systemPrompt = getAnalyzeSystemPrompt(await getCategories());
 
         const response = await client.chat.completions.create({
             model: settings.openai_model,
@@ -774,7 +1105,7 @@ app.post('/api/ai/analyze', async (req, res) => {
             ],
             temperature: 0.3,
             response_format: { type: "json_object" }
-        });
+        }, { timeout: 30000, signal });
 
         const content = response.choices[0].message.content;
         const data = JSON.parse(content);
@@ -800,7 +1131,7 @@ app.post('/api/ai/analyze', async (req, res) => {
 });
 
 app.post('/api/ai/optimize', async (req, res) => {
-    const { prompt } = req.body;
+    const { prompt, stream } = req.body;
     const settings = await getSettings();
 
     if (!settings.openai_api_key) {
@@ -808,21 +1139,10 @@ app.post('/api/ai/optimize', async (req, res) => {
     }
 
     try {
-        const client = new OpenAI({
-            apiKey: settings.openai_api_key,
-            baseURL: settings.openai_base_url,
-            timeout: 300000
-        });
-
-        const systemPrompt = settings.optimize_prompt_template || `你是一个专业的提示词工程师 (Prompt Engineer)。
-你的任务是优化用户提供的 Prompt，使其更加清晰、结构化，并能引导 AI 生成更高质量的结果。
-请保持原意不变，但进行以下改进：
-1. 明确角色设定 (Role)
-2. 补充背景信息 (Context)
-3. 细化任务描述 (Task)
-4. 规定输出格式 (Format)
+        const client = getOpenAIClient(settings);
+        const signal = abortOnClose(res);
 
-请直接输出优化后的 Prompt 内容，不要包含解释性文字。`;
+        const systemPrompt = settings.optimize_prompt_template || DEFAULT_OPTIMIZE_PROMPT;
 
         const response = await client.chat.completions.create({
             model: settings.openai_model,
@@ -830,9 +1150,12 @@ app.post('/api/ai/optimize', async (req, res) => {
                 { role: "system", content: systemPrompt },
                 { role: "user", content: prompt }
             ],
-            temperature: 0.7
-        });
+            temperature: 0.7,
+            stream: !!stream
+        }, { timeout: 300000, signal });
 
+        // With `stream: true` the optimized prompt is relayed token by token as SSE
+        if (stream) return sendCompletionStream(res, response);
         res.json({ optimized_prompt: response.choices[0].message.content });
 
     } catch (e) {
@@ -842,15 +1165,75 @@ app.post('/api/ai/optimize', async (req, res) => {
 });
 
 
+// Unknown API paths get a JSON 404 rather than falling through to static files / index.html
+app.use('/api', (req, res) => {
+    res.status(404).json({ error: "Not found" });
+});
+
+const STATIC_DIR = path.join(__dirname, 'static');
+const ASSETS_DIR = path.join(STATIC_DIR, 'assets');
+const INDEX_FILE = path.join(STATIC_DIR, 'index.html');
+
+// index.html only changes on redeploy: load it once and tag it with a content hash
+let indexHtml = null;
+let indexEtag = null;
+if (fs.pathExistsSync(INDEX_FILE)) {
+    indexHtml = fs.readFileSync(INDEX_FILE);
+    indexEtag = `"${crypto.createHash('sha1').update(indexHtml).digest('hex')}"`;
+}
+
+// Assets that the image build precompressed (foo.js -> foo.js.gz), found once at startup
+const gzippedAssets = new Set();
+if (fs.pathExistsSync(ASSETS_DIR)) {
+    for (const file of fs.readdirSync(ASSETS_DIR)) {
+        if (file.endsWith('.gz')) gzippedAssets.add(file.slice(0, -3));
+    }
+}
+
+const ASSET_HEADERS = {
+    'Cache-Control': 'public, max-age=31536000, immutable',
+    'Vary': 'Accept-Encoding'
+};
+
+// Serve the precompressed variant when the browser accepts gzip, instead of the raw file
+app.use('/assets', (req, res, next) => {
+    // Like express.static, only answer GET/HEAD and pass other methods on
+    if (req.method !== 'GET' && req.method !== 'HEAD') return next();
+    const name = req.path.slice(1);
+    if (!gzippedAssets.has(name) || !/\bgzip\b/.test(req.headers['accept-encoding'] || '')) {
+        return next();
+    }
+    res.set({ ...ASSET_HEADERS, 'Content-Encoding': 'gzip' });
+    res.type(path.extname(name));
+    res.sendFile(path.join(ASSETS_DIR, `${name}.gz`));
+});
+
 // Serve Static Files (Frontend)
-app.use(express.static(path.join(__dirname, 'static')));
+// Vite emits content-hashed names under assets/, so those can be cached forever
+app.use(express.static(STATIC_DIR, {
+    index: false,
+    setHeaders: (res, filePath) => {
+        if (filePath.startsWith(ASSETS_DIR + path.sep)) {
+            res.set(ASSET_HEADERS);
+        }
+    }
+}));
 
 // Handle SPA routing: serve index.html for any unknown routes
 app.get('*', (req, res) => {
-    res.sendFile(path.join(__dirname, 'static', 'index.html'));
+    if (!indexHtml) return res.sendFile(INDEX_FILE);
+
+    res.set({
+        'Content-Type': 'text/html; charset=utf-8',
+        'Cache-Control': 'no-cache'
+    });
+    if (notModified(req, res, indexEtag)) return;
+    res.send(indexHtml);
 });
 
 app.listen(PORT, () => {
     console.log(`Server running on port ${PORT}`);
     console.log(`Data directory: ${DATA_DIR}`);
+
+    warmProjectCache().catch(e => console.error("Error warming project cache", e));
 });